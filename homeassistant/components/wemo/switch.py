@@ -1,12 +1,16 @@
 """Support for WeMo switches."""
 import asyncio
-from datetime import datetime, timedelta
+from datetime import timedelta
 import logging
 
+import voluptuous as vol
+
 from homeassistant.components.switch import SwitchEntity
 from homeassistant.const import STATE_OFF, STATE_ON, STATE_STANDBY, STATE_UNKNOWN
-from homeassistant.const import ATTR_ENTITY_ID
+from homeassistant.core import callback
+from homeassistant.helpers import config_validation as cv
 from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.service import async_extract_entity_ids
 from homeassistant.util import convert
 
 from .const import (
@@ -14,6 +18,7 @@ from .const import (
     SERVICE_UPDATE_CROCKPOT_SETTINGS,
 )
 from .entity import WemoSubscriptionEntity
+from .pywemo.exceptions import ActionException
 
 SCAN_INTERVAL = timedelta(seconds=10)
 PARALLEL_UPDATES = 0
@@ -37,43 +42,69 @@ WEMO_ON = 1
 WEMO_OFF = 0
 WEMO_STANDBY = 8
 
+CROCKPOT_UPDATE_SETTINGS_SCHEMA = cv.make_entity_service_schema(
+    {
+        vol.Optional("mode", default="0"): cv.string,
+        vol.Optional("time", default="0"): cv.string,
+    }
+)
+
+_INSIGHT_STATE_MAP = {
+    WEMO_ON: STATE_ON,
+    WEMO_OFF: STATE_OFF,
+    WEMO_STANDBY: STATE_STANDBY,
+}
+
 
 async def async_setup_entry(hass, config_entry, async_add_entities):
     """Set up WeMo switches and CrockPots."""
-    crockpots = []
+    # CrockPot entities keyed by entity_id, maintained by the entities themselves
+    crockpots = {}
 
-    async def _discovered_wemo(device):
-        """Handle a discovered Wemo device."""
+    def _create_entity(device):
+        """Create the entity for a discovered Wemo device."""
         if device.model_name == 'Crockpot':
-            entity = CrockPot(device)
-            crockpots.append(entity)
-            async_add_entities([entity])
-        else:
-            async_add_entities([WemoSwitch(device)])
+            return CrockPot(device, crockpots)
+        return WemoSwitch(device)
+
+    @callback
+    def _discovered_wemo(device):
+        """Handle a discovered Wemo device."""
+        async_add_entities([_create_entity(device)])
 
     async_dispatcher_connect(hass, f"{WEMO_DOMAIN}.switch", _discovered_wemo)
 
-    await asyncio.gather(
-        *[
-            _discovered_wemo(device)
+    # Add the devices discovered before the platform was loaded in one batch.
+    async_add_entities(
+        [
+            _create_entity(device)
             for device in hass.data[WEMO_DOMAIN]["pending"].pop("switch")
         ]
     )
 
-    def handle_crockpot_update_settings(service):
+    async def handle_crockpot_update_settings(service):
 
-        entity_ids = service.data.get(ATTR_ENTITY_ID)
-        crockpots_service = [entity for entity in crockpots if entity.entity_id in entity_ids]
+        entity_ids = await async_extract_entity_ids(hass, service)
+        crockpots_service = [
+            crockpots[entity_id] for entity_id in entity_ids & crockpots.keys()
+        ]
 
-        mode = service.data.get('mode', 0)
-        time = service.data.get('time', 0)
+        mode = service.data["mode"]
+        time = service.data["time"]
 
-        for crockpot in crockpots_service:
-            crockpot.update_settings(mode, time)
+        await asyncio.gather(
+            *[
+                crockpot.async_update_settings(mode, time)
+                for crockpot in crockpots_service
+            ]
+        )
 
     # Register service(s)
     hass.services.async_register(
-        WEMO_DOMAIN, SERVICE_UPDATE_CROCKPOT_SETTINGS, handle_crockpot_update_settings
+        WEMO_DOMAIN,
+        SERVICE_UPDATE_CROCKPOT_SETTINGS,
+        handle_crockpot_update_settings,
+        schema=CROCKPOT_UPDATE_SETTINGS_SCHEMA,
     )
 
 
@@ -87,10 +118,27 @@ class WemoSwitch(WemoSubscriptionEntity, SwitchEntity):
         self.maker_params = None
         self.coffeemaker_mode = None
         self._mode_string = None
+        self._detail_state = None
+        self._current_power_w = None
+        self._today_energy_kwh = None
+        self._power_threshold_w = None
+        self._attrs = {}
+
+        # The model of a device never changes, so pick its extra update step once.
+        self._update_extra = {
+            "Insight": self._update_insight,
+            "Maker": self._update_maker,
+            "CoffeeMaker": self._update_coffeemaker,
+        }.get(device.model_name)
+        self._icon = "mdi:coffee" if device.model_name == "CoffeeMaker" else None
 
     @property
     def extra_state_attributes(self):
         """Return the state attributes of the device."""
+        return self._attrs
+
+    def _compute_attrs(self):
+        """Build the state attributes from the last device update."""
         attr = {}
         if self.maker_params:
             # Is the maker sensor on or off.
@@ -114,9 +162,7 @@ class WemoSwitch(WemoSubscriptionEntity, SwitchEntity):
             attr["on_latest_time"] = WemoSwitch.as_uptime(self.insight_params["onfor"])
             attr["on_today_time"] = WemoSwitch.as_uptime(self.insight_params["ontoday"])
             attr["on_total_time"] = WemoSwitch.as_uptime(self.insight_params["ontotal"])
-            attr["power_threshold_w"] = (
-                convert(self.insight_params["powerthreshold"], float, 0.0) / 1000.0
-            )
+            attr["power_threshold_w"] = self._power_threshold_w
 
         if self.coffeemaker_mode is not None:
             attr[ATTR_COFFEMAKER_MODE] = self.coffeemaker_mode
@@ -126,101 +172,141 @@ class WemoSwitch(WemoSubscriptionEntity, SwitchEntity):
     @staticmethod
     def as_uptime(_seconds):
         """Format seconds into uptime string in the format: 00d 00h 00m 00s."""
-        uptime = datetime(1, 1, 1) + timedelta(seconds=_seconds)
-        return "{:0>2d}d {:0>2d}h {:0>2d}m {:0>2d}s".format(
-            uptime.day - 1, uptime.hour, uptime.minute, uptime.second
-        )
+        minutes, seconds = divmod(int(_seconds), 60)
+        hours, minutes = divmod(minutes, 60)
+        days, hours = divmod(hours, 24)
+        return f"{days:02d}d {hours:02d}h {minutes:02d}m {seconds:02d}s"
 
     @property
     def current_power_w(self):
         """Return the current power usage in W."""
-        if self.insight_params:
-            return convert(self.insight_params["currentpower"], float, 0.0) / 1000.0
+        return self._current_power_w
 
     @property
     def today_energy_kwh(self):
         """Return the today total energy usage in kWh."""
-        if self.insight_params:
-            miliwatts = convert(self.insight_params["todaymw"], float, 0.0)
-            return round(miliwatts / (1000.0 * 1000.0 * 60), 2)
+        return self._today_energy_kwh
 
     @property
     def detail_state(self):
         """Return the state of the device."""
-        if self.coffeemaker_mode is not None:
-            return self._mode_string
-        if self.insight_params:
-            standby_state = int(self.insight_params["state"])
-            if standby_state == WEMO_ON:
-                return STATE_ON
-            if standby_state == WEMO_OFF:
-                return STATE_OFF
-            if standby_state == WEMO_STANDBY:
-                return STATE_STANDBY
-            return STATE_UNKNOWN
+        return self._detail_state
 
     @property
     def icon(self):
         """Return the icon of device based on its type."""
-        if self.wemo.model_name == "CoffeeMaker":
-            return "mdi:coffee"
-        return None
+        return self._icon
 
-    def turn_on(self, **kwargs):
+    async def async_turn_on(self, **kwargs):
         """Turn the switch on."""
+        await self.hass.async_add_executor_job(self._turn_on)
+        self.async_write_ha_state()
+
+    async def async_turn_off(self, **kwargs):
+        """Turn the switch off."""
+        await self.hass.async_add_executor_job(self._turn_off)
+        self.async_write_ha_state()
+
+    def _turn_on(self):
+        """Turn the device on (runs in the executor)."""
         with self._wemo_exception_handler("turn on"):
             if self.wemo.on():
                 self._state = WEMO_ON
 
-        self.schedule_update_ha_state()
-
-    def turn_off(self, **kwargs):
-        """Turn the switch off."""
+    def _turn_off(self):
+        """Turn the device off (runs in the executor)."""
         with self._wemo_exception_handler("turn off"):
             if self.wemo.off():
                 self._state = WEMO_OFF
 
-        self.schedule_update_ha_state()
-
     def _update(self, force_update=True):
         """Update the device state."""
         with self._wemo_exception_handler("update status"):
             self._state = self.wemo.get_state(force_update)
 
-            if self.wemo.model_name == "Insight":
-                self.insight_params = self.wemo.insight_params
-                self.insight_params["standby_state"] = self.wemo.get_standby_state
-            elif self.wemo.model_name == "Maker":
-                self.maker_params = self.wemo.maker_params
-            elif self.wemo.model_name == "CoffeeMaker":
-                self.coffeemaker_mode = self.wemo.mode
-                self._mode_string = self.wemo.mode_string
+            if self._update_extra:
+                self._update_extra()
+
+            self._attrs = self._compute_attrs()
+
+    def _update_insight(self):
+        """Update the Insight power readings."""
+        self.insight_params = self.wemo.insight_params
+        self.insight_params["standby_state"] = self.wemo.get_standby_state
+        self._detail_state = _INSIGHT_STATE_MAP.get(
+            int(self.insight_params["state"]), STATE_UNKNOWN
+        )
+        self._current_power_w = (
+            convert(self.insight_params["currentpower"], float, 0.0) / 1000.0
+        )
+        miliwatts = convert(self.insight_params["todaymw"], float, 0.0)
+        self._today_energy_kwh = round(miliwatts / (1000.0 * 1000.0 * 60), 2)
+        self._power_threshold_w = (
+            convert(self.insight_params["powerthreshold"], float, 0.0) / 1000.0
+        )
+
+    def _update_maker(self):
+        """Update the Maker sensor and switch parameters."""
+        self.maker_params = self.wemo.maker_params
+
+    def _update_coffeemaker(self):
+        """Update the CoffeeMaker mode."""
+        self.coffeemaker_mode = self.wemo.mode
+        self._mode_string = self.wemo.mode_string
+        if self.coffeemaker_mode is not None:
+            self._detail_state = self._mode_string
+        else:
+            self._detail_state = None
+
 
-class CrockPot(WemoSwitch):
+class CrockPot(WemoSubscriptionEntity, SwitchEntity):
     """Representation of a WeMo CrockPot."""
 
-    def __init__(self, device):
-        """Initialize the WeMo switch."""
-        WemoSwitch.__init__(self, device)
+    def __init__(self, device, crockpots):
+        """Initialize the WeMo CrockPot."""
+        super().__init__(device)
+        self._crockpots = crockpots
         self.crockpot_mode = None
         self.crockpot_remaining_time = None
         self.crockpot_cooked_time = None
+        self._mode_string = None
+        self._detail_state = None
+        self._is_on = False
+        self._attrs = {}
 
         # The crockpot may sometimes disconnect briefly and reconnect
         # Ignore this for brief periods to avoid the switch reporting as off intermittently
-        self._ignoreUnavailableCounter = 0
+        self._ignore_unavailable_counter = 0
 
         # After a reconnect, the crockpot may indicate that its state is turned off during the first couple of updates
         # We want to ignore these so ignore the first 2 updates that switch the mode to 0
-        self._ignoreUpdatesCounter = 0
+        self._ignore_updates_counter = 0
 
     @property
     def should_poll(self) -> bool:
         return True
 
+    async def async_added_to_hass(self) -> None:
+        """CrockPot added to Home Assistant."""
+        await super().async_added_to_hass()
+
+        # The entity_id is only known once the entity has been added
+        entity_id = self.entity_id
+        self._crockpots[entity_id] = self
+        self.async_on_remove(lambda: self._crockpots.pop(entity_id, None))
+
     @property
     def extra_state_attributes(self):
         """Return the state attributes of the device."""
+        return self._attrs
+
+    @property
+    def detail_state(self):
+        """Return the state of the device."""
+        return self._detail_state
+
+    def _compute_attrs(self):
+        """Build the state attributes from the last device update."""
         attr = {}
 
         if self.crockpot_mode is not None:
@@ -233,22 +319,28 @@ class CrockPot(WemoSwitch):
 
         return attr
 
-    @property
-    def detail_state(self):
-        """Return the state of the device."""
-        if self.crockpot_mode is not None:
-            return self._mode_string
-
     @property
     def available(self):
         """Return true if switch is available."""
-        if not self._available:
-            if self._ignoreUnavailableCounter < 3:
-                _LOGGER.warning('Switch not available but ignoring for now. _ignoreUnavailableCounter=' + str(self._ignoreUnavailableCounter))
-                self._ignoreUnavailableCounter = self._ignoreUnavailableCounter + 1
-                return True
-
-        return self._available
+        return self._available or self._ignore_unavailable_counter <= 3
+
+    async def async_update(self):
+        """Update the CrockPot state, counting the polls it stays unreachable."""
+        # If an update is in progress, no poll happens so there is nothing to count
+        if self._update_lock.locked():
+            return
+
+        await super().async_update()
+
+        # Keep reporting the CrockPot as available for the first 3 failed polls
+        if not self._available and self._ignore_unavailable_counter <= 3:
+            self._ignore_unavailable_counter = self._ignore_unavailable_counter + 1
+            if self._ignore_unavailable_counter <= 3:
+                _LOGGER.warning(
+                    "Switch not available but ignoring for now. "
+                    "_ignore_unavailable_counter=%d",
+                    self._ignore_unavailable_counter,
+                )
 
     @property
     def icon(self):
@@ -257,67 +349,85 @@ class CrockPot(WemoSwitch):
     @property
     def is_on(self):
         """Return true if switch is on. Standby is on."""
-        return self.crockpot_mode is not None and int(self.crockpot_mode) > 0
+        return self._is_on
 
-    def turn_on(self, **kwargs):
+    async def async_turn_on(self, **kwargs):
         """Turn the switch on."""
-        self.update_settings("52", "360")       # "High" for 6 hours
+        await self.async_update_settings("52", "360")       # "High" for 6 hours
 
-    def turn_off(self, **kwargs):
+    async def async_turn_off(self, **kwargs):
         """Turn the switch off."""
-        WemoSwitch.turn_off(self)
-        # Make sure the state updates aren't ignored since the update was triggered by HASS
-        self._ignoreUpdatesCounter = 2
+        await self.hass.async_add_executor_job(self._turn_off)
+        await self._async_locked_update(True)
+
+    def _turn_off(self):
+        """Turn the CrockPot off (runs in the executor)."""
+        with self._wemo_exception_handler("turn off"):
+            if self.wemo.off():
+                self._state = WEMO_OFF
 
-        self._update(True)
-        self.schedule_update_ha_state()
+        # Make sure the state updates aren't ignored since the update was triggered by HASS
+        self._ignore_updates_counter = 2
 
-    def update_settings(self, mode, time):
+    async def async_update_settings(self, mode, time):
         """Update CrockPot settings."""
-    
+        await self.hass.async_add_executor_job(self._update_settings, mode, time)
+        await self._async_locked_update(True)
+
+    def _update_settings(self, mode, time):
+        """Send new settings to the CrockPot (runs in the executor)."""
         try:
             self.wemo.update_settings(mode, time)
 
             if int(mode) == 0:
                 # Make sure the state updates aren't ignored since the update was triggered by HASS
-                self._ignoreUpdatesCounter = 2
+                self._ignore_updates_counter = 2
             else:
                 # Ignore state updates where state=Off since slow cooker sometimes reports wrong values when turning on
-                self._ignoreUpdatesCounter = 0
+                self._ignore_updates_counter = 0
         except ActionException as err:
             _LOGGER.warning("Error while updating settings for %s (%s)", self.name, err)
             self._available = False
 
-        self._update(True)
-        self.schedule_update_ha_state()
-
     def _update(self, force_update):
         """Update the device state."""
         try:
+            # get_state fetches the whole CrockPot state in one request; the
+            # mode/time properties below only read from that response.
             state = self.wemo.get_state(force_update)
-            updateState = True
+            mode = self.wemo.mode
+            mode_int = int(mode) if mode is not None else None
 
-            if (self.crockpot_mode is None or self.crockpot_mode != "0") and self.wemo.mode == "0":
-                if self._ignoreUpdatesCounter != 2:
-                    updateState = False
-                    self._ignoreUpdatesCounter = self._ignoreUpdatesCounter + 1
-                    _LOGGER.warning('Ignoring state update. _ignoreUpdatesCounter=' + str(self._ignoreUpdatesCounter))
-                else:
-                    self._ignoreUpdatesCounter = 0
-            else:
-                self._ignoreUpdatesCounter = 0
+            # A switch to mode 0 from any other (or unknown) mode may be bogus
+            off_transition = mode_int == 0 and (
+                self.crockpot_mode is None or self._is_on
+            )
 
-            if updateState:
+            if off_transition and self._ignore_updates_counter < 2:
+                self._ignore_updates_counter = self._ignore_updates_counter + 1
+                _LOGGER.warning(
+                    "Ignoring state update. _ignore_updates_counter=%d",
+                    self._ignore_updates_counter,
+                )
+            else:
+                self._ignore_updates_counter = 0
                 self._state = state
                 self._mode_string = self.wemo.mode_string
-                self.crockpot_mode = self.wemo.mode
+                self.crockpot_mode = mode
                 self.crockpot_remaining_time = self.wemo.remaining_time
                 self.crockpot_cooked_time = self.wemo.cooked_time
+                if mode_int is not None:
+                    self._detail_state = self._mode_string
+                    self._is_on = mode_int > 0
+                else:
+                    self._detail_state = None
+                    self._is_on = False
+                self._attrs = self._compute_attrs()
 
             if not self._available:
                 _LOGGER.warning('Reconnected to %s', self.name)
                 self._available = True
-                self._ignoreUnavailableCounter = 0
+                self._ignore_unavailable_counter = 0
         except ActionException as err:
             _LOGGER.warning("Could not update status for %s (%s)", self.name, err)
             self._available = False
\ No newline at end of file
@@ -1,12 +1,33 @@
 """Tests for the Wemo switch entity."""
+from unittest.mock import MagicMock, create_autospec
 
 import pytest
+import pywemo
 
 from homeassistant.components.homeassistant import (
     DOMAIN as HA_DOMAIN,
     SERVICE_UPDATE_ENTITY,
 )
-from homeassistant.const import ATTR_ENTITY_ID, STATE_OFF, STATE_ON
+from homeassistant.components.switch import DOMAIN as SWITCH_DOMAIN
+from homeassistant.components.wemo.const import (
+    DOMAIN,
+    SERVICE_UPDATE_CROCKPOT_SETTINGS,
+)
+from homeassistant.components.wemo.pywemo.exceptions import ActionException
+from homeassistant.components.wemo.switch import WemoSwitch
+from homeassistant.components.wemo.wemo_device import DeviceWrapper
+from homeassistant.const import (
+    ATTR_ENTITY_ID,
+    SERVICE_TURN_OFF,
+    SERVICE_TURN_ON,
+    STATE_OFF,
+    STATE_ON,
+    STATE_STANDBY,
+    STATE_UNAVAILABLE,
+    STATE_UNKNOWN,
+)
+from homeassistant.helpers import entity_platform, entity_registry as er
+from homeassistant.helpers.dispatcher import async_dispatcher_send
 from homeassistant.setup import async_setup_component
 
 from . import entity_test_helpers
@@ -78,3 +99,402 @@ async def test_switch_update_entity(hass, pywemo_registry, pywemo_device, wemo_e
         blocking=True,
     )
     assert hass.states.get(wemo_entity.entity_id).state == STATE_OFF
+
+
+@pytest.mark.parametrize(
+    "seconds, expected",
+    [
+        (0, "00d 00h 00m 00s"),
+        (3 * 3600 + 25 * 60 + 7, "00d 03h 25m 07s"),
+        (40 * 86400 + 3661, "40d 01h 01m 01s"),
+    ],
+)
+def test_as_uptime(seconds, expected):
+    """Verify Insight uptimes are formatted without wrapping the day count."""
+    assert WemoSwitch.as_uptime(seconds) == expected
+
+
+async def _async_update_entity(hass, entity_id):
+    """Poll the device for the entity."""
+    await async_setup_component(hass, HA_DOMAIN, {})
+    await hass.services.async_call(
+        HA_DOMAIN,
+        SERVICE_UPDATE_ENTITY,
+        {ATTR_ENTITY_ID: [entity_id]},
+        blocking=True,
+    )
+
+
+def _get_entity(hass, entity_id):
+    """Return the entity object for an entity_id."""
+    for platform in entity_platform.async_get_platforms(hass, DOMAIN):
+        if entity_id in platform.entities:
+            return platform.entities[entity_id]
+    return None
+
+
+def _insight_params(**params):
+    """Return Insight parameters, overridden by params."""
+    return {
+        "state": "1",
+        "onfor": 3661,
+        "ontoday": 7322,
+        "ontotal": 40 * 86400 + 3661,
+        "currentpower": 1500,
+        "todaymw": 60000000,
+        "powerthreshold": 8000,
+        **params,
+    }
+
+
+@pytest.mark.parametrize("pywemo_model", ["Insight"])
+async def test_insight_power_and_energy(hass, pywemo_device, wemo_entity):
+    """Verify the Insight power, energy and uptime values written to the state."""
+    pywemo_device.insight_params = _insight_params()
+    await _async_update_entity(hass, wemo_entity.entity_id)
+
+    attributes = hass.states.get(wemo_entity.entity_id).attributes
+    assert attributes["current_power_w"] == 1.5
+    assert attributes["today_energy_kwh"] == 1.0
+    assert attributes["power_threshold_w"] == 8.0
+    assert attributes["on_latest_time"] == "00d 01h 01m 01s"
+    assert attributes["on_today_time"] == "00d 02h 02m 02s"
+    assert attributes["on_total_time"] == "40d 01h 01m 01s"
+
+
+@pytest.mark.parametrize("pywemo_model", ["Insight"])
+async def test_insight_attributes_follow_updates(hass, pywemo_device, wemo_entity):
+    """Verify the state attributes are rebuilt on each poll."""
+    pywemo_device.insight_params = _insight_params()
+    await _async_update_entity(hass, wemo_entity.entity_id)
+    attributes = hass.states.get(wemo_entity.entity_id).attributes
+    assert attributes["current_power_w"] == 1.5
+    assert attributes["on_latest_time"] == "00d 01h 01m 01s"
+
+    pywemo_device.insight_params = _insight_params(currentpower=2500, onfor=59)
+    await _async_update_entity(hass, wemo_entity.entity_id)
+    attributes = hass.states.get(wemo_entity.entity_id).attributes
+    assert attributes["current_power_w"] == 2.5
+    assert attributes["on_latest_time"] == "00d 00h 00m 59s"
+
+
+@pytest.mark.parametrize("pywemo_model", ["Insight"])
+async def test_insight_attributes_kept_on_failed_poll(hass, pywemo_device, wemo_entity):
+    """Verify a failed poll keeps the attributes from the last good poll."""
+    pywemo_device.insight_params = _insight_params()
+    await _async_update_entity(hass, wemo_entity.entity_id)
+    entity = _get_entity(hass, wemo_entity.entity_id)
+    attributes = dict(entity.extra_state_attributes)
+
+    pywemo_device.insight_params = _insight_params(onfor=59)
+    pywemo_device.get_state.side_effect = ActionException("unreachable")
+    await _async_update_entity(hass, wemo_entity.entity_id)
+    assert hass.states.get(wemo_entity.entity_id).state == STATE_UNAVAILABLE
+    assert entity.extra_state_attributes == attributes
+
+
+@pytest.mark.parametrize("pywemo_model", ["Insight"])
+@pytest.mark.parametrize(
+    "insight_state, expected",
+    [
+        ("1", STATE_ON),
+        ("0", STATE_OFF),
+        ("8", STATE_STANDBY),
+        ("5", STATE_UNKNOWN),
+    ],
+)
+async def test_insight_state_detail(
+    hass, pywemo_device, wemo_entity, insight_state, expected
+):
+    """Verify the Insight state is mapped to the state_detail attribute."""
+    pywemo_device.insight_params = _insight_params(state=insight_state)
+    await _async_update_entity(hass, wemo_entity.entity_id)
+    attributes = hass.states.get(wemo_entity.entity_id).attributes
+    assert attributes["state_detail"] == expected
+
+
+@pytest.mark.parametrize("pywemo_model", ["CoffeeMaker"])
+async def test_coffeemaker_state_detail(hass, pywemo_device, wemo_entity):
+    """Verify the CoffeeMaker mode is cleared when it becomes unknown."""
+    pywemo_device.mode = 4
+    pywemo_device.mode_string = "Brewing"
+    await _async_update_entity(hass, wemo_entity.entity_id)
+    attributes = hass.states.get(wemo_entity.entity_id).attributes
+    assert attributes["coffeemaker_mode"] == 4
+    assert attributes["state_detail"] == "Brewing"
+
+    pywemo_device.mode = None
+    pywemo_device.mode_string = None
+    await _async_update_entity(hass, wemo_entity.entity_id)
+    attributes = hass.states.get(wemo_entity.entity_id).attributes
+    assert "coffeemaker_mode" not in attributes
+    assert "state_detail" not in attributes
+    assert _get_entity(hass, wemo_entity.entity_id).detail_state is None
+
+
+@pytest.mark.parametrize("pywemo_model", ["Maker"])
+async def test_maker_attributes(hass, pywemo_device, wemo_entity):
+    """Verify the Maker sensor and switch mode attributes."""
+    pywemo_device.maker_params = {"hassensor": 1, "sensorstate": 1, "switchmode": 0}
+    await _async_update_entity(hass, wemo_entity.entity_id)
+    attributes = hass.states.get(wemo_entity.entity_id).attributes
+    assert attributes["sensor_state"] == STATE_OFF
+    assert attributes["switch_mode"] == "toggle"
+
+    pywemo_device.maker_params = {"hassensor": 1, "sensorstate": 0, "switchmode": 1}
+    await _async_update_entity(hass, wemo_entity.entity_id)
+    attributes = hass.states.get(wemo_entity.entity_id).attributes
+    assert attributes["sensor_state"] == STATE_ON
+    assert attributes["switch_mode"] == "momentary"
+
+
+@pytest.mark.parametrize(
+    "pywemo_model, icon",
+    [("CoffeeMaker", "mdi:coffee"), ("LightSwitch", None)],
+)
+async def test_switch_icon(hass, pywemo_device, wemo_entity, icon):
+    """Verify only the CoffeeMaker gets its own icon."""
+    pywemo_device.mode = 4
+    pywemo_device.mode_string = "Brewing"
+    await _async_update_entity(hass, wemo_entity.entity_id)
+    assert hass.states.get(wemo_entity.entity_id).attributes.get("icon") == icon
+
+
+async def test_switch_no_power_and_energy(hass, pywemo_device, wemo_entity):
+    """Verify a LightSwitch reports no power or energy values."""
+    await _async_update_entity(hass, wemo_entity.entity_id)
+
+    entity = _get_entity(hass, wemo_entity.entity_id)
+    assert entity.current_power_w is None
+    assert entity.today_energy_kwh is None
+    attributes = hass.states.get(wemo_entity.entity_id).attributes
+    assert "current_power_w" not in attributes
+    assert "today_energy_kwh" not in attributes
+    assert "power_threshold_w" not in attributes
+
+
+async def test_switch_turn_on_off(hass, pywemo_device, wemo_entity):
+    """Verify the switch on/off services control the device."""
+    await async_setup_component(hass, SWITCH_DOMAIN, {})
+    entity_id = wemo_entity.entity_id
+
+    pywemo_device.on.return_value = True
+    await hass.services.async_call(
+        SWITCH_DOMAIN, SERVICE_TURN_ON, {ATTR_ENTITY_ID: entity_id}, blocking=True
+    )
+    pywemo_device.on.assert_called_once()
+    assert hass.states.get(entity_id).state == STATE_ON
+
+    pywemo_device.off.return_value = True
+    await hass.services.async_call(
+        SWITCH_DOMAIN, SERVICE_TURN_OFF, {ATTR_ENTITY_ID: entity_id}, blocking=True
+    )
+    pywemo_device.off.assert_called_once()
+    assert hass.states.get(entity_id).state == STATE_OFF
+
+
+@pytest.mark.parametrize("service", [SERVICE_TURN_ON, SERVICE_TURN_OFF])
+async def test_switch_turn_on_off_with_exception(
+    hass, pywemo_device, wemo_entity, service
+):
+    """Verify a failing on/off call marks the switch unavailable."""
+    await async_setup_component(hass, SWITCH_DOMAIN, {})
+    entity_id = wemo_entity.entity_id
+
+    pywemo_device.on.side_effect = ActionException("unreachable")
+    pywemo_device.off.side_effect = ActionException("unreachable")
+    await hass.services.async_call(
+        SWITCH_DOMAIN, service, {ATTR_ENTITY_ID: entity_id}, blocking=True
+    )
+    assert hass.states.get(entity_id).state == STATE_UNAVAILABLE
+
+
+def _make_crockpot(device):
+    """Make a pywemo device report itself as a CrockPot."""
+    device.model_name = "Crockpot"
+    device.mode = "52"
+    device.mode_string = "High"
+    device.remaining_time = 360
+    device.cooked_time = 0
+    device.update_settings = MagicMock()
+    return device
+
+
+@pytest.fixture(name="crockpot_device")
+def crockpot_device_fixture(pywemo_device):
+    """Make the pywemo device report itself as a CrockPot."""
+    return _make_crockpot(pywemo_device)
+
+
+@pytest.fixture(name="crockpot_entity")
+async def crockpot_entity_fixture(hass, crockpot_device, wemo_entity):
+    """Fixture for a Wemo CrockPot entity in hass."""
+    await async_setup_component(hass, HA_DOMAIN, {})
+    yield wemo_entity
+
+
+@pytest.mark.parametrize("as_list", [False, True])
+async def test_crockpot_update_settings(
+    hass, crockpot_device, crockpot_entity, as_list
+):
+    """Verify the settings service targets CrockPots by entity_id."""
+    entity_id = crockpot_entity.entity_id
+    await hass.services.async_call(
+        DOMAIN,
+        SERVICE_UPDATE_CROCKPOT_SETTINGS,
+        {ATTR_ENTITY_ID: [entity_id] if as_list else entity_id, "mode": "50"},
+        blocking=True,
+    )
+    crockpot_device.update_settings.assert_called_once_with("50", "0")
+
+
+async def test_crockpot_update_settings_multiple(
+    hass, crockpot_device, crockpot_entity
+):
+    """Verify a failing CrockPot does not stop the other targets updating."""
+    second_device = _make_crockpot(create_autospec(pywemo.LightSwitch, instance=True))
+    second_device.name = "WemoCrockPot2"
+    second_device.serialnumber = "WemoSerialNumber2"
+    second_device.get_state.return_value = 1
+    async_dispatcher_send(
+        hass,
+        f"{DOMAIN}.switch",
+        DeviceWrapper(hass, second_device, "second_device_id"),
+    )
+    await hass.async_block_till_done()
+    second_entity_id = er.async_get(hass).async_get_entity_id(
+        SWITCH_DOMAIN, DOMAIN, "WemoSerialNumber2"
+    )
+    assert second_entity_id is not None
+
+    crockpot_device.update_settings.side_effect = ActionException("unreachable")
+    await hass.services.async_call(
+        DOMAIN,
+        SERVICE_UPDATE_CROCKPOT_SETTINGS,
+        {
+            ATTR_ENTITY_ID: [crockpot_entity.entity_id, second_entity_id],
+            "mode": "50",
+            "time": "300",
+        },
+        blocking=True,
+    )
+    crockpot_device.update_settings.assert_called_once_with("50", "300")
+    second_device.update_settings.assert_called_once_with("50", "300")
+    assert hass.states.get(second_entity_id).state == STATE_ON
+
+
+async def test_crockpot_update_settings_removed(hass, crockpot_device, crockpot_entity):
+    """Verify a removed CrockPot is no longer targeted by the settings service."""
+    entity_id = crockpot_entity.entity_id
+    er.async_get(hass).async_remove(entity_id)
+    await hass.async_block_till_done()
+    assert hass.states.get(entity_id) is None
+
+    await hass.services.async_call(
+        DOMAIN,
+        SERVICE_UPDATE_CROCKPOT_SETTINGS,
+        {ATTR_ENTITY_ID: entity_id, "mode": "50", "time": "300"},
+        blocking=True,
+    )
+    crockpot_device.update_settings.assert_not_called()
+
+
+async def test_crockpot_unavailable_grace(hass, crockpot_device, crockpot_entity):
+    """Verify a CrockPot stays available for the first 3 failed polls."""
+    entity_id = crockpot_entity.entity_id
+    crockpot_device.get_state.side_effect = ActionException("unreachable")
+
+    for _ in range(3):
+        await _async_update_entity(hass, entity_id)
+        assert hass.states.get(entity_id).state != STATE_UNAVAILABLE
+
+    await _async_update_entity(hass, entity_id)
+    assert hass.states.get(entity_id).state == STATE_UNAVAILABLE
+
+    # Reconnecting resets the grace counter.
+    crockpot_device.get_state.side_effect = None
+    await _async_update_entity(hass, entity_id)
+    assert hass.states.get(entity_id).state == STATE_ON
+
+    crockpot_device.get_state.side_effect = ActionException("unreachable")
+    await _async_update_entity(hass, entity_id)
+    assert hass.states.get(entity_id).state == STATE_ON
+
+
+async def test_crockpot_unavailable_grace_skipped_poll(
+    hass, crockpot_device, crockpot_entity
+):
+    """Verify polls skipped while an update is in progress are not counted."""
+    entity_id = crockpot_entity.entity_id
+    entity = _get_entity(hass, entity_id)
+    crockpot_device.get_state.side_effect = ActionException("unreachable")
+
+    await _async_update_entity(hass, entity_id)
+    async with entity._update_lock:
+        for _ in range(3):
+            await entity.async_update()
+
+    await _async_update_entity(hass, entity_id)
+    await _async_update_entity(hass, entity_id)
+    assert hass.states.get(entity_id).state != STATE_UNAVAILABLE
+
+
+async def test_crockpot_ignores_spurious_off(hass, crockpot_device, crockpot_entity):
+    """Verify the first two readings that switch a CrockPot to mode 0 are ignored."""
+    entity_id = crockpot_entity.entity_id
+    await _async_update_entity(hass, entity_id)
+    assert hass.states.get(entity_id).state == STATE_ON
+
+    crockpot_device.mode = "0"
+    crockpot_device.mode_string = "Off"
+    for _ in range(2):
+        await _async_update_entity(hass, entity_id)
+        state = hass.states.get(entity_id)
+        assert state.state == STATE_ON
+        assert state.attributes["crockpot_mode"] == "52"
+        assert state.attributes["state_detail"] == "High"
+
+    await _async_update_entity(hass, entity_id)
+    state = hass.states.get(entity_id)
+    assert state.state == STATE_OFF
+    assert state.attributes["crockpot_mode"] == "0"
+    assert state.attributes["state_detail"] == "Off"
+
+
+async def test_crockpot_turn_off_not_ignored(hass, crockpot_device, crockpot_entity):
+    """Verify turning a CrockPot off from hass is accepted straight away."""
+    entity_id = crockpot_entity.entity_id
+    await _async_update_entity(hass, entity_id)
+    assert hass.states.get(entity_id).state == STATE_ON
+
+    crockpot_device.mode = "0"
+    crockpot_device.mode_string = "Off"
+    await hass.services.async_call(
+        SWITCH_DOMAIN,
+        SERVICE_TURN_OFF,
+        SERVICE_TURN_ON,
+        {ATTR_ENTITY_ID: entity_id},
+        blocking=True,
+    )
+    crockpot_device.off.assert_called_once()
+    assert hass.states.get(entity_id).state == STATE_OFF
+
+
+async def test_crockpot_update_settings_off_not_ignored(
+    hass, crockpot_device, crockpot_entity
+):
+    """Verify setting a CrockPot to mode 0 from hass is accepted straight away."""
+    entity_id = crockpot_entity.entity_id
+    await _async_update_entity(hass, entity_id)
+    assert hass.states.get(entity_id).state == STATE_ON
+
+    crockpot_device.mode = "0"
+    crockpot_device.mode_string = "Off"
+    await hass.services.async_call(
+        DOMAIN,
+        SERVICE_UPDATE_CROCKPOT_SETTINGS,
+        {ATTR_ENTITY_ID: entity_id, "mode": "0"},
+        blocking=True,
+    )
+    crockpot_device.update_settings.assert_called_once_with("0", "0")
+    assert hass.states.get(entity_id).state == STATE_OFF